@@ -0,0 +1,321 @@
+# productivity_bot/analytics.py
+from __future__ import annotations
+
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from .config import DEFAULT_TIMEZONE
+from . import excel_report
+
+STATUSES = ["done", "pending"]
+
+# hour buckets used for the time-of-day distribution
+_DAY_PARTS = [0, 6, 12, 17, 21, 24]
+_DAY_PART_LABELS = ["🌙 Night", "🌅 Morning", "☀️ Afternoon", "🌆 Evening", "🌙 Late"]
+
+
+class _Aggregator:
+    """
+    Running aggregates over the progress log.
+    Only rows appended since the last refresh are grouped and merged in,
+    so repeated /stats calls never rescan the whole history.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.rows = 0
+        self.mtime: float | None = None
+        # date -> counts per status
+        self.daily = pd.DataFrame(columns=STATUSES, index=pd.DatetimeIndex([]), dtype="int64")
+        # task key -> earliest pending date not yet closed by a "done"
+        self.open_pending = pd.Series(dtype="datetime64[ns]")
+        # one (task, days) record per pending -> done cycle
+        self.latency = pd.DataFrame({"task": pd.Series(dtype="object"), "days": pd.Series(dtype="int64")})
+        self.tasks: set[str] = set()
+        self.done_tasks: set[str] = set()
+
+    def ingest(self, df: pd.DataFrame) -> None:
+        if len(df) < self.rows:
+            # log was truncated (e.g. /clear) -> start over
+            self.reset()
+        chunk = df.iloc[self.rows:]
+        self.rows = len(df)
+        if chunk.empty:
+            return
+
+        chunk = pd.DataFrame({
+            "date": pd.to_datetime(chunk["date"]).dt.normalize(),
+            "key": chunk["task"].astype(str).str.strip().str.lower(),
+            "status": chunk["status"].astype(str).str.strip().str.lower(),
+        })
+
+        counts = (
+            chunk.groupby(["date", "status"]).size()
+            .unstack(fill_value=0)
+            .reindex(columns=STATUSES, fill_value=0)
+        )
+        self.daily = self.daily.add(counts, fill_value=0).astype("int64").sort_index()
+
+        self._ingest_cycles(chunk)
+
+        self.tasks.update(chunk["key"].unique())
+        self.done_tasks.update(chunk.loc[chunk["status"] == "done", "key"].unique())
+
+    def _ingest_cycles(self, chunk: pd.DataFrame) -> None:
+        """
+        Pair pending -> done cycles per task in date order.
+        A row's cycle is the number of "done" rows before it for the same task;
+        cycle c opens at its earliest pending and closes at its done. Pendings
+        still open from earlier chunks belong to cycle 0, so ingesting a log in
+        one batch or row by row yields the same latencies.
+        """
+        ev = chunk.loc[chunk["status"].isin(STATUSES)].sort_values(["key", "date"], kind="stable")
+        if ev.empty:
+            return
+        is_done = ev["status"] == "done"
+        ev = ev.assign(cycle=is_done.astype("int64").groupby(ev["key"]).cumsum() - is_done)
+
+        carried = self.open_pending.copy()
+        carried.index = pd.MultiIndex.from_arrays(
+            [carried.index, np.zeros(len(carried), dtype="int64")], names=["key", "cycle"]
+        )
+        starts = (
+            pd.concat([ev.loc[~is_done].groupby(["key", "cycle"])["date"].min(), carried])
+            .groupby(level=["key", "cycle"]).min()
+            .rename("pending")
+        )
+
+        closed = ev.loc[is_done].join(starts, on=["key", "cycle"], how="inner")
+        days = (closed["date"] - closed["pending"]).dt.days
+        new = pd.DataFrame({"task": closed["key"], "days": days})[days >= 0]
+        self.latency = pd.concat([self.latency, new], ignore_index=True)
+
+        # cycles not closed by a done stay open for the next chunk
+        dones = is_done.groupby(ev["key"]).sum()
+        still_open = starts.reset_index()
+        last_cycle = still_open["key"].map(dones).fillna(0).astype("int64")
+        still_open = still_open[still_open["cycle"] == last_cycle]
+        self.open_pending = still_open.set_index("key")["pending"].rename(None).rename_axis(None)
+
+
+_AGG = _Aggregator()
+
+
+def reset() -> None:
+    """Forget all cached aggregates (call after wiping the progress log)."""
+    _AGG.reset()
+
+
+def snapshot() -> dict:
+    return dict(vars(_AGG))
+
+
+def restore(state: dict) -> None:
+    """Reload aggregates from snapshot(); refresh() picks up rows added since."""
+    vars(_AGG).update(state)
+
+
+def refresh(df: pd.DataFrame | None = None) -> None:
+    """
+    Bring the aggregates up to date.
+    Pass the log log_task_update() just wrote to skip re-reading the Excel file;
+    with no DataFrame the file is re-read only if it changed on disk.
+    """
+    path = excel_report.EXCEL_FILE
+    if not path.exists():
+        _AGG.reset()
+        return
+    mtime = path.stat().st_mtime
+    if df is None:
+        if mtime == _AGG.mtime:
+            return
+        df = pd.read_excel(path)
+    _AGG.ingest(df)
+    _AGG.mtime = mtime
+
+
+def _run_lengths(active: np.ndarray) -> np.ndarray:
+    padded = np.concatenate(([0], active.astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(padded))
+    return edges[1::2] - edges[::2]
+
+
+def _done_per_day(today: date) -> pd.Series:
+    """Done counts for every calendar day from the first log entry to `today`."""
+    if _AGG.daily.empty:
+        return pd.Series(dtype="int64")
+    first = _AGG.daily.index.min()
+    last = max(_AGG.daily.index.max(), pd.Timestamp(today))
+    full = pd.date_range(first, last, freq="D")
+    return _AGG.daily["done"].reindex(full, fill_value=0)
+
+
+def streaks(today: date | None = None) -> tuple[int, int]:
+    """Return (current, longest) streak of days with at least one task done."""
+    today = today or datetime.now(ZoneInfo(DEFAULT_TIMEZONE)).date()
+    per_day = _done_per_day(today)
+    if per_day.empty:
+        return 0, 0
+
+    active = per_day.to_numpy() > 0
+    runs = _run_lengths(active)
+    longest = int(runs.max()) if runs.size else 0
+
+    # log dates are server-local, `today` is in DEFAULT_TIMEZONE: they can disagree
+    if pd.Timestamp(today) < per_day.index[0]:
+        return 0, longest
+
+    # today isn't over yet: an empty today doesn't break yesterday's streak
+    upto = active[: per_day.index.get_loc(pd.Timestamp(today)) + 1]
+    if upto.size and not upto[-1]:
+        upto = upto[:-1]
+    gaps = np.flatnonzero(~upto)
+    current = int(upto.size - gaps[-1] - 1) if gaps.size else int(upto.size)
+    return current, longest
+
+
+def rolling_trends(today: date | None = None) -> pd.DataFrame:
+    """Daily done counts with 7- and 30-day rolling averages."""
+    today = today or datetime.now(ZoneInfo(DEFAULT_TIMEZONE)).date()
+    per_day = _done_per_day(today)
+    return pd.DataFrame({
+        "done": per_day,
+        "avg_7d": per_day.rolling(7, min_periods=1).mean(),
+        "avg_30d": per_day.rolling(30, min_periods=1).mean(),
+    })
+
+
+def time_of_day(events: list[dict], tz_name: str | None = None) -> pd.Series:
+    """
+    Distribution of completed tasks over the day, by joining done task titles
+    with the start time of the matching calendar event.
+    """
+    tz = tz_name or DEFAULT_TIMEZONE
+    timed = [
+        (e.get("summary", ""), e["start"]["dateTime"])
+        for e in events
+        if "dateTime" in e.get("start", {})
+    ]
+    empty = pd.Series(0, index=_DAY_PART_LABELS, dtype="int64")
+    if not timed or not _AGG.done_tasks:
+        return empty
+
+    ev = pd.DataFrame(timed, columns=["summary", "start"])
+    ev["key"] = ev["summary"].astype(str).str.strip().str.lower()
+    ev = ev[ev["key"].isin(_AGG.done_tasks)]
+    if ev.empty:
+        return empty
+
+    hours = pd.to_datetime(ev["start"], utc=True).dt.tz_convert(tz).dt.hour
+    parts = pd.cut(hours, bins=_DAY_PARTS, labels=_DAY_PART_LABELS, right=False, ordered=False)
+    return parts.value_counts().reindex(_DAY_PART_LABELS, fill_value=0)
+
+
+def compute_stats(
+    events: list[dict] | None = None,
+    tz_name: str | None = None,
+    today: date | None = None,
+) -> dict:
+    """Summary stats over the aggregates (call refresh() first)."""
+    tz = tz_name or DEFAULT_TIMEZONE
+    today = today or datetime.now(ZoneInfo(tz)).date()
+
+    current, longest = streaks(today)
+    trends = rolling_trends(today)
+    lat = _AGG.latency["days"]
+    totals = _AGG.daily.sum()
+
+    return {
+        "tasks": len(_AGG.tasks),
+        "done": int(totals.get("done", 0)),
+        "pending": int(totals.get("pending", 0)),
+        "completion_rate": len(_AGG.done_tasks) / len(_AGG.tasks) if _AGG.tasks else 0.0,
+        "current_streak": current,
+        "longest_streak": longest,
+        "avg_7d": float(trends["avg_7d"].iloc[-1]) if not trends.empty else 0.0,
+        "avg_30d": float(trends["avg_30d"].iloc[-1]) if not trends.empty else 0.0,
+        "latency_mean": float(lat.mean()) if not lat.empty else None,
+        "latency_median": float(lat.median()) if not lat.empty else None,
+        "slowest": _AGG.latency.groupby("task")["days"].max().nlargest(3).to_dict(),
+        "time_of_day": time_of_day(events or [], tz).to_dict(),
+    }
+
+
+def format_stats(stats: dict) -> str:
+    """Render compute_stats() output as a Markdown message."""
+    lines = [
+        "📈 *Your Productivity Stats*",
+        "─────────────────────",
+        f"✅ Completion rate: *{stats['completion_rate']:.0%}* "
+        f"({stats['done']} done / {stats['pending']} pending updates)",
+        f"🔥 Current streak: *{stats['current_streak']}* days",
+        f"🏆 Longest streak: *{stats['longest_streak']}* days",
+        f"📊 Done per day: {stats['avg_7d']:.1f} (7d) · {stats['avg_30d']:.1f} (30d)",
+    ]
+    if stats["latency_mean"] is not None:
+        lines.append(
+            f"⏱️ Pending → done: {stats['latency_mean']:.1f} days avg, "
+            f"{stats['latency_median']:.0f} median"
+        )
+        for task, days in stats["slowest"].items():
+            lines.append(f"   • {task}: {days} days")
+    if any(stats["time_of_day"].values()):
+        lines.append("─────────────────────")
+        lines.append("🕒 When you get things done:")
+        for part, n in stats["time_of_day"].items():
+            if n:
+                lines.append(f"   {part}: {n}")
+    return "\n".join(lines)
+
+
+def _synthetic_log(years: int = 3, per_day: int = 12) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    days = pd.date_range(end=pd.Timestamp.today().normalize(), periods=365 * years, freq="D")
+    n = len(days) * per_day
+    return pd.DataFrame({
+        "date": np.repeat(days.strftime("%Y-%m-%d"), per_day),
+        "task": [f"task {i}" for i in rng.integers(0, 2000, n)],
+        "status": rng.choice(STATUSES, n),
+    })
+
+
+def _benchmark(years: int = 3, per_day: int = 12) -> None:
+    """
+    Time the /stats path over synthetic history written to a scratch Excel log:
+    a cold refresh(), a refresh() after one /done, and compute_stats().
+    """
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.object(excel_report, "EXCEL_FILE", Path(tmp) / "progress.xlsx"):
+        df = _synthetic_log(years, per_day)
+        df.to_excel(excel_report.EXCEL_FILE, index=False)
+
+        reset()
+        t0 = time.perf_counter()
+        refresh()
+        t1 = time.perf_counter()
+        logged = excel_report.log_task_update("task 1", "done")
+        t2 = time.perf_counter()
+        refresh(logged)
+        t3 = time.perf_counter()
+        stats = compute_stats()
+        t4 = time.perf_counter()
+    reset()
+
+    print(f"{len(df)} rows over {years} years")
+    print(f"cold refresh (reads xlsx):  {(t1 - t0) * 1000:.1f} ms")
+    print(f"refresh after one /done:    {(t3 - t2) * 1000:.1f} ms")
+    print(f"compute_stats:              {(t4 - t3) * 1000:.1f} ms")
+    print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    _benchmark()
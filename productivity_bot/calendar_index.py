@@ -0,0 +1,183 @@
+# productivity_bot/calendar_index.py
+from __future__ import annotations
+
+import time as _time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+from operator import itemgetter
+from typing import List, Tuple
+from zoneinfo import ZoneInfo
+
+from .config import DEFAULT_TIMEZONE, FREE_DAY_START_HOUR, FREE_DAY_END_HOUR
+from .google_calendar import list_events_between
+
+# how far ahead /free searches, and how long before an index is refetched
+HORIZON = timedelta(days=7)
+_TTL_SECONDS = 600
+# indexes are built a little past HORIZON so "now + HORIZON" stays covered
+_SLACK = timedelta(days=1)
+
+# free slots start on quarter hours
+_SLOT_STEP_MIN = 15
+
+# (start, end, summary, event id)
+Busy = Tuple[datetime, datetime, str, str]
+
+
+def _round_up(dt: datetime) -> datetime:
+    base = dt.replace(second=0, microsecond=0)
+    if base < dt:
+        base += timedelta(minutes=1)
+    return base + timedelta(minutes=-base.minute % _SLOT_STEP_MIN)
+
+
+class IntervalIndex:
+    """
+    Busy intervals sorted by start, plus a running max of end times.
+    Overlap checks are two bisects: intervals starting before `end` are a
+    prefix, and the running max tells whether any of them reaches past `start`.
+    """
+
+    def __init__(self, lo: datetime, hi: datetime) -> None:
+        self.lo = lo
+        self.hi = hi
+        self.built_at = _time.time()
+        self._items: List[Busy] = []
+        self._max_end: List[datetime] = []
+        self._ids: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stale(self) -> bool:
+        return _time.time() - self.built_at > _TTL_SECONDS
+
+    def covers(self, lo: datetime, hi: datetime) -> bool:
+        return self.lo <= lo and hi <= self.hi
+
+    def has_event(self, event_id: str) -> bool:
+        return event_id in self._ids
+
+    def add(self, start: datetime, end: datetime, summary: str = "", event_id: str = "") -> None:
+        if event_id:
+            if event_id in self._ids:
+                return
+            self._ids.add(event_id)
+        i = bisect_right(self._items, start, key=itemgetter(0))
+        self._items.insert(i, (start, end, summary, event_id))
+        # running max only changes from the insertion point on
+        del self._max_end[i:]
+        top = self._max_end[-1] if self._max_end else None
+        for _, e, _, _ in self._items[i:]:
+            top = e if top is None or e > top else top
+            self._max_end.append(top)
+
+    def conflict(self, start: datetime, end: datetime) -> Busy | None:
+        """First busy interval overlapping [start, end), or None."""
+        k = bisect_left(self._items, end, key=itemgetter(0))
+        j = bisect_right(self._max_end, start, hi=k)
+        return self._items[j] if j < k else None
+
+    def free_slots(
+        self,
+        duration: timedelta,
+        after: datetime,
+        until: datetime,
+        count: int = 5,
+        tz_name: str | None = None,
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        Up to `count` open slots of `duration` within working hours.
+        The search is clipped to the indexed range [lo, hi].
+        """
+        tz = ZoneInfo(tz_name or DEFAULT_TIMEZONE)
+        slots: List[Tuple[datetime, datetime]] = []
+        until = min(until, self.hi)
+        cursor = _round_up(max(after, self.lo).astimezone(tz))
+        day = cursor.date()
+
+        while len(slots) < count and day <= until.astimezone(tz).date():
+            midnight = datetime.combine(day, time(0), tzinfo=tz)
+            t = max(cursor, midnight + timedelta(hours=FREE_DAY_START_HOUR))
+            day_end = min(until, midnight + timedelta(hours=FREE_DAY_END_HOUR))
+            while len(slots) < count and t + duration <= day_end:
+                busy = self.conflict(t, t + duration)
+                if busy is None:
+                    slots.append((t, t + duration))
+                    t += duration
+                else:
+                    t = _round_up(busy[1].astimezone(tz))
+            day += timedelta(days=1)
+        return slots
+
+    def next_free(
+        self, start: datetime, duration: timedelta, tz_name: str | None = None
+    ) -> Tuple[datetime, datetime] | None:
+        """Earliest open slot of `duration` at or after `start`, within the index."""
+        slots = self.free_slots(duration, start, start + HORIZON, 1, tz_name)
+        return slots[0] if slots else None
+
+
+# chat_id -> IntervalIndex
+_INDEXES: dict[int, IntervalIndex] = {}
+
+
+def _event_bounds(e: dict) -> Busy | None:
+    """Timed, opaque events block time; all-day and 'free' events don't."""
+    if e.get("transparency") == "transparent":
+        return None
+    start = e.get("start", {}).get("dateTime")
+    end = e.get("end", {}).get("dateTime")
+    if not start or not end:
+        return None
+    return (
+        datetime.fromisoformat(start),
+        datetime.fromisoformat(end),
+        e.get("summary", "(no title)"),
+        e.get("id", ""),
+    )
+
+
+def get_index(
+    chat_id: int, lo: datetime, hi: datetime, tz_name: str | None = None
+) -> IntervalIndex:
+    """
+    Index covering at least [lo, hi] (and always now .. now + HORIZON + slack).
+    Reuses the cached one when possible; otherwise fetches once from Calendar.
+    """
+    tz = tz_name or DEFAULT_TIMEZONE
+    idx = _INDEXES.get(chat_id)
+    if idx is not None and idx.covers(lo, hi) and not idx.stale():
+        return idx
+
+    now = datetime.now(ZoneInfo(tz))
+    lo, hi = min(lo, now), max(hi, now + HORIZON + _SLACK)
+    idx = IntervalIndex(lo, hi)
+    for e in list_events_between(lo, hi, tz):
+        bounds = _event_bounds(e)
+        if bounds:
+            idx.add(*bounds)
+    _INDEXES[chat_id] = idx
+    return idx
+
+
+def record(
+    chat_id: int, start: datetime, end: datetime, summary: str = "", event_id: str = ""
+) -> None:
+    """Keep a cached index current after add_event inserts a new event."""
+    idx = _INDEXES.get(chat_id)
+    if idx is not None:
+        idx.add(start, end, summary, event_id)
+
+
+def invalidate(chat_id: int) -> None:
+    _INDEXES.pop(chat_id, None)
+
+
+def snapshot() -> dict[int, IntervalIndex]:
+    return dict(_INDEXES)
+
+
+def restore(state: dict[int, IntervalIndex]) -> None:
+    """Reload indexes from snapshot(); stale ones are refetched on next use."""
+    _INDEXES.update(state)
@@ -21,3 +21,7 @@ DEFAULT_TIMEZONE: str = os.getenv("DEFAULT_TIMEZONE", "Asia/Kolkata")
 
 # config.py
 OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")
+
+# Working hours searched by /free and conflict suggestions (24h clock)
+FREE_DAY_START_HOUR: int = int(os.getenv("FREE_DAY_START_HOUR", "9"))
+FREE_DAY_END_HOUR: int = int(os.getenv("FREE_DAY_END_HOUR", "21"))
@@ -10,8 +10,16 @@ DATA_DIR.mkdir(exist_ok=True)
 EXCEL_FILE = DATA_DIR / "progress.xlsx"
 
 
-def log_task_update(task_title: str, status: str, date: datetime | None = None):
-    """Append a row (date, task, status) to the Excel log."""
+def log_task_update(
+    task_title: str,
+    status: str,
+    date: datetime | None = None,
+    update_id: int | None = None,
+) -> pd.DataFrame:
+    """
+    Append a row (date, task, status) to the Excel log and return the full log.
+    Rows tagged with a Telegram `update_id` are written at most once.
+    """
     date = date or datetime.now()
     row = {"date": date.strftime("%Y-%m-%d"), "task": task_title, "status": status}
 
@@ -21,29 +29,44 @@ def log_task_update(task_title: str, status: str, date: datetime | None = None):
     else:
         df = pd.DataFrame(columns=["date", "task", "status"])
 
+    if update_id is not None:
+        if "update_id" in df.columns and (df["update_id"] == update_id).any():
+            return df
+        row["update_id"] = update_id
+
     df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
     df.to_excel(EXCEL_FILE, index=False)
+    return df
 
 
-def generate_report() -> tuple[str, str]:
-    """Generate Excel and PNG chart. Returns (xlsx_path, png_path)."""
+def generate_report(trends: pd.DataFrame | None = None) -> tuple[str, str]:
+    """
+    Generate Excel and PNG chart. Returns (xlsx_path, png_path).
+    If `trends` (see analytics.rolling_trends) is given, a rolling-average panel is added.
+    """
     if not EXCEL_FILE.exists():
         raise FileNotFoundError("No progress data yet. Log some tasks first.")
 
     df = pd.read_excel(EXCEL_FILE)
 
-# Aggregate by date
-daily = df.groupby(["date", "status"]).size().unstack(fill_value=0)
+    # Aggregate by date
+    daily = df.groupby(["date", "status"]).size().unstack(fill_value=0)
 
-# Chart
-fig, ax = plt.subplots(figsize=(6, 4))
-daily.plot(kind="bar", stacked=True, ax=ax)
-ax.set_ylabel("Tasks")
-ax.set_title("Daily Progress")
-plt.tight_layout()
+    # Chart
+    if trends is None or trends.empty:
+        fig, ax = plt.subplots(figsize=(6, 4))
+    else:
+        fig, (ax, ax_trend) = plt.subplots(2, 1, figsize=(6, 7))
+        trends[["avg_7d", "avg_30d"]].plot(ax=ax_trend)
+        ax_trend.set_ylabel("Done / day")
+        ax_trend.set_title("Rolling Trend (7d / 30d)")
+    daily.plot(kind="bar", stacked=True, ax=ax)
+    ax.set_ylabel("Tasks")
+    ax.set_title("Daily Progress")
+    plt.tight_layout()
 
-png_path = DATA_DIR / "progress.png"
-fig.savefig(png_path)
-plt.close(fig)
+    png_path = DATA_DIR / "progress.png"
+    fig.savefig(png_path)
+    plt.close(fig)
 
-return str(EXCEL_FILE), str(png_path)
+    return str(EXCEL_FILE), str(png_path)
@@ -8,6 +8,7 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
 from .config import GOOGLE_CLIENT_SECRETS_FILE, GOOGLE_TOKEN_FILE, DEFAULT_TIMEZONE
 
@@ -68,7 +69,13 @@ def add_event(
     end_dt: datetime,
     description: str = "",
     tz_name: str | None = None,
+    event_id: str | None = None,
 ) -> dict:
+    """
+    Insert an event. Passing a stable `event_id` (base32hex, 5-1024 chars)
+    makes retries idempotent: a second insert of the same event returns the
+    existing one; an id already used by a different event still raises.
+    """
     tz = tz_name or DEFAULT_TIMEZONE
     body = {
         "summary": summary,
@@ -82,6 +89,21 @@ def add_event(
             "timeZone": tz,
         },
     }
+    if event_id:
+        body["id"] = event_id
     service = get_service()
-    created = service.events().insert(calendarId="primary", body=body).execute()
+    try:
+        created = service.events().insert(calendarId="primary", body=body).execute()
+    except HttpError as e:
+        if not (event_id and e.resp.status == 409):
+            raise
+        existing = service.events().get(calendarId="primary", eventId=event_id).execute()
+        existing_start = existing.get("start", {}).get("dateTime")
+        if (
+            existing.get("summary") != summary
+            or not existing_start
+            or datetime.fromisoformat(existing_start) != start_dt
+        ):
+            raise
+        return existing
     return created
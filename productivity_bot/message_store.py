@@ -18,6 +18,16 @@ def _remember(chat_id: int, message_id: int) -> None:
         dq.popleft()
 
 
+def snapshot() -> dict[int, list[Tuple[int, datetime]]]:
+    return {chat_id: list(dq) for chat_id, dq in _STORE.items()}
+
+
+def restore(state: dict[int, list[Tuple[int, datetime]]]) -> None:
+    """Reload remembered message IDs so /clear still works after a restart."""
+    for chat_id, items in state.items():
+        _STORE[chat_id] = deque(items[-_MAX_KEEP:])
+
+
 async def send_text(chat, text: str, **kwargs):
     """Send a text message & remember it."""
     m = await chat.send_message(text, **kwargs)
@@ -0,0 +1,223 @@
+# productivity_bot/state_store.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import pickle
+import time
+from pathlib import Path
+
+from telegram import Update
+from telegram.ext import (
+    Application,
+    ApplicationHandlerStop,
+    ContextTypes,
+    PersistenceInput,
+    PicklePersistence,
+    TypeHandler,
+)
+
+from . import analytics, calendar_index, message_store
+from .excel_report import DATA_DIR
+
+log = logging.getLogger("productivity_bot.state")
+
+# processed update_id window + polling offset (rewritten after every update)
+STATE_FILE = DATA_DIR / "updates.json"
+# in-memory caches, for warm restarts (written every few updates and on shutdown)
+SNAPSHOT_FILE = DATA_DIR / "snapshot.pickle"
+# per-chat handler state, e.g. an /addtask conflict prompt awaiting a button press
+CHAT_DATA_FILE = DATA_DIR / "chat_data.pickle"
+
+_WINDOW_SIZE = 4096
+_SNAPSHOT_EVERY = 25
+_SNAPSHOT_VERSION = 3
+# after a week without updates Telegram picks the next update_id at random,
+# so an older checkpoint can't be compared against new ids
+_MAX_IDLE_SECONDS = 6 * 24 * 3600
+
+
+class UpdateWindow:
+    """
+    Bitmap of processed update_ids over a sliding window of `size` ids.
+    Ids just below the window were slid out after processing and count as seen;
+    an id far below it, or any id after about a week without updates, means
+    Telegram may have restarted its numbering, so the window resets.
+    """
+
+    def __init__(self, size: int = _WINDOW_SIZE) -> None:
+        self.size = size
+        self.base: int | None = None
+        self.bits = 0
+        self.last_mark: float | None = None
+
+    @property
+    def offset(self) -> int | None:
+        """Next update_id to ask Telegram for (highest processed + 1)."""
+        if self.base is None or not self.bits:
+            return None
+        return self.base + self.bits.bit_length()
+
+    def _restarted(self, update_id: int) -> bool:
+        if self.base is None:
+            return False
+        idle = self.last_mark is not None and time.time() - self.last_mark > _MAX_IDLE_SECONDS
+        return idle or update_id < self.base - self.size
+
+    def seen(self, update_id: int) -> bool:
+        if self.base is None or self._restarted(update_id):
+            return False
+        if update_id < self.base:
+            return True
+        return bool(self.bits >> (update_id - self.base) & 1)
+
+    def mark(self, update_id: int) -> None:
+        if self.base is None or self._restarted(update_id):
+            self.base, self.bits = update_id, 0
+        if update_id < self.base:
+            return
+        shift = update_id - self.base - self.size + 1
+        if shift > 0:
+            self.bits >>= shift
+            self.base += shift
+        self.bits |= 1 << (update_id - self.base)
+        self.last_mark = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "base": self.base,
+            "bits": format(self.bits, "x"),
+            "offset": self.offset,
+            "saved_at": self.last_mark or time.time(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, now: float | None = None) -> "UpdateWindow":
+        """Load a checkpoint; one idle for about a week comes back empty."""
+        w = cls()
+        now = time.time() if now is None else now
+        if now - data.get("saved_at", 0) > _MAX_IDLE_SECONDS:
+            return w
+        w.base = data.get("base")
+        w.bits = int(data.get("bits") or "0", 16)
+        w.last_mark = data.get("saved_at")
+        return w
+
+
+_WINDOW = UpdateWindow()
+_since_snapshot = 0
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def checkpoint() -> None:
+    """Persist the processed-id window and polling offset."""
+    _atomic_write(STATE_FILE, json.dumps(_WINDOW.to_dict()).encode("utf-8"))
+
+
+def load_checkpoint() -> None:
+    global _WINDOW
+    try:
+        _WINDOW = UpdateWindow.from_dict(json.loads(STATE_FILE.read_text("utf-8")))
+    except FileNotFoundError:
+        _WINDOW = UpdateWindow()
+    except Exception as e:
+        log.warning("Ignoring unreadable %s: %s", STATE_FILE.name, e)
+        _WINDOW = UpdateWindow()
+
+
+def persistence() -> PicklePersistence:
+    """PTB persistence for chat_data only; everything else lives in the snapshot."""
+    return PicklePersistence(
+        filepath=CHAT_DATA_FILE,
+        store_data=PersistenceInput(bot_data=False, user_data=False, callback_data=False),
+    )
+
+
+def save_snapshot() -> None:
+    """
+    Pickle analytics aggregates, calendar indexes and sent-message ids.
+    Calendar indexes are a best-effort cache: after a restart they are only
+    reused while still within their TTL, since events may change in Google meanwhile.
+    """
+    state = {
+        "version": _SNAPSHOT_VERSION,
+        "analytics": analytics.snapshot(),
+        "calendar": calendar_index.snapshot(),
+        "messages": message_store.snapshot(),
+    }
+    _atomic_write(SNAPSHOT_FILE, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def load_snapshot() -> bool:
+    """Restore caches saved by save_snapshot(). Returns False on a cold start."""
+    try:
+        with open(SNAPSHOT_FILE, "rb") as f:
+            state = pickle.load(f)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        log.warning("Ignoring unreadable %s: %s", SNAPSHOT_FILE.name, e)
+        return False
+    if state.get("version") != _SNAPSHOT_VERSION:
+        return False
+
+    analytics.restore(state["analytics"])
+    calendar_index.restore(state["calendar"])
+    message_store.restore(state["messages"])
+    return True
+
+
+# === Handlers ===
+
+async def skip_processed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Group -1: drop updates that were already handled before a restart."""
+    if _WINDOW.seen(update.update_id):
+        log.info("Skipping already processed update %s", update.update_id)
+        raise ApplicationHandlerStop
+
+
+async def mark_processed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Group 1: runs after the command handler, then checkpoints."""
+    global _since_snapshot
+    _WINDOW.mark(update.update_id)
+    checkpoint()
+    # flush chat_data now rather than on PTB's 60s timer
+    await context.application.update_persistence()
+    _since_snapshot += 1
+    if _since_snapshot >= _SNAPSHOT_EVERY:
+        save_snapshot()
+        _since_snapshot = 0
+
+
+def install(app: Application) -> None:
+    app.add_handler(TypeHandler(Update, skip_processed), group=-1)
+    app.add_handler(TypeHandler(Update, mark_processed), group=1)
+
+
+async def post_init(app: Application) -> None:
+    load_checkpoint()
+    if load_snapshot():
+        log.info("Warm restart: caches restored from %s", SNAPSHOT_FILE.name)
+
+    # confirm everything up to the checkpoint so Telegram doesn't redeliver it
+    # (no offset when the checkpoint was too old to trust)
+    offset = _WINDOW.offset
+    if offset is not None:
+        try:
+            await app.bot.get_updates(offset=offset, limit=1, timeout=0)
+        except Exception as e:
+            log.warning("Could not confirm offset %s: %s", offset, e)
+
+
+async def post_shutdown(app: Application) -> None:
+    checkpoint()
+    save_snapshot()
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
 from telegram import (
@@ -22,6 +22,7 @@ from telegram.ext import (
 from .config import TELEGRAM_BOT_TOKEN, DEFAULT_TIMEZONE
 from .google_calendar import list_events_between, add_event
 from .utils import today_bounds, fmt_hhmm
+from . import analytics, calendar_index, state_store
 from .voice_input import ogg_bytes_to_wav_bytes, transcribe_wav_bytes
 from .ai_assistant import parse_task
 from .excel_report import generate_report, EXCEL_FILE, DATA_DIR, log_task_update
@@ -57,6 +58,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         [InlineKeyboardButton("📅 Today", callback_data="today")],
         [InlineKeyboardButton("➕ Add Task", callback_data="add_task")],
         [InlineKeyboardButton("📊 Report", callback_data="report")],
+        [InlineKeyboardButton("📈 Stats", callback_data="stats")],
         [InlineKeyboardButton("✅ Done", callback_data="done_info")],
         [InlineKeyboardButton("⏳ Pending", callback_data="pending_info")],
         [InlineKeyboardButton("🗑️ Clear Data", callback_data="clear")],
@@ -70,9 +72,11 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "⚡ Commands:\n"
         "• `/today` → View today’s schedule\n"
         "• `/addtask <text>` → Add a task\n"
+        "• `/free [minutes] [count]` → Next open slots this week\n"
         "• `/done <task>` → Mark a task done (logs to Excel)\n"
         "• `/pending <task>` → Mark a task pending (logs to Excel)\n"
-        "• `/report` → See progress report (Excel + chart)\n"
+        "• `/report [trends] [stats]` → See progress report (Excel + chart)\n"
+        "• `/stats` → Completion rate, streaks & trends\n"
         "• `/clear` → Reset stats & remove recent bot messages\n"
         "─────────────────────\n"
         "🎙️ You can also send me a *voice note* to create tasks automatically."
@@ -119,6 +123,41 @@ async def today(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await send_text(update.effective_chat, "❌ Couldn’t fetch events. Check Google auth.")
 
 
+def _slot_text(start_dt: datetime, end_dt: datetime) -> str:
+    return f"{start_dt.strftime('%a %d %b')}  ⏰ {fmt_hhmm(start_dt)}–{fmt_hhmm(end_dt)}"
+
+
+def _event_id(update: Update) -> str:
+    """
+    Calendar event id derived from the update, so a replayed update can't insert twice.
+    The message time keeps ids distinct if Telegram ever reuses update_ids.
+    """
+    sent = int(update.effective_message.date.timestamp())
+    return f"pbot{abs(update.effective_chat.id)}u{update.update_id}t{sent}"
+
+
+async def _create_task(
+    update: Update, title: str, start_dt: datetime, end_dt: datetime, event_id: str
+) -> None:
+    add_event(title, start_dt, end_dt, event_id=event_id)
+    calendar_index.record(update.effective_chat.id, start_dt, end_dt, title, event_id)
+
+    await send_animation(
+        update.effective_chat,
+        "https://media.giphy.com/media/26xBukh7Pn9xq/200w.gif",
+        caption=(
+            f"✅ *Task Added!*\n"
+            "─────────────────────\n"
+            f"📝 {title}\n"
+            f"📅 {start_dt.strftime('%Y-%m-%d')}\n"
+            f"⏰ {start_dt.strftime('%H:%M')} - {end_dt.strftime('%H:%M')}\n"
+            "─────────────────────\n"
+            "📌 Added to Google Calendar!"
+        ),
+        parse_mode="Markdown",
+    )
+
+
 async def addtask(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     text = " ".join(context.args) if context.args else None
     if not text:
@@ -133,34 +172,102 @@ async def addtask(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     try:
         start_dt = datetime.fromisoformat(parsed["start"]).astimezone(ZoneInfo(DEFAULT_TIMEZONE))
         end_dt = datetime.fromisoformat(parsed["end"]).astimezone(ZoneInfo(DEFAULT_TIMEZONE))
-        add_event(parsed["title"], start_dt, end_dt)
 
-        await send_animation(
-            update.effective_chat,
-            "https://media.giphy.com/media/26xBukh7Pn9xq/200w.gif",
-            caption=(
-                f"✅ *Task Added!*\n"
-                "─────────────────────\n"
-                f"📝 {parsed['title']}\n"
-                f"📅 {start_dt.strftime('%Y-%m-%d')}\n"
-                f"⏰ {start_dt.strftime('%H:%M')} - {end_dt.strftime('%H:%M')}\n"
-                "─────────────────────\n"
-                "📌 Added to Google Calendar!"
-            ),
-            parse_mode="Markdown",
-        )
+        event_id = _event_id(update)
+        idx = calendar_index.get_index(update.effective_chat.id, start_dt, end_dt)
+        # a replayed /addtask finds its own event: don't report it as a conflict
+        clash = None if idx.has_event(event_id) else idx.conflict(start_dt, end_dt)
+        if clash:
+            alt = idx.next_free(start_dt, end_dt - start_dt)
+            context.chat_data["pending_task"] = {
+                "title": parsed["title"], "start": start_dt, "end": end_dt, "alt": alt,
+                "event_id": event_id,
+            }
+            keyboard = [[InlineKeyboardButton("✅ Add anyway", callback_data="addtask_force")]]
+            if alt:
+                keyboard.append([InlineKeyboardButton(
+                    f"🔁 Use {fmt_hhmm(alt[0])}–{fmt_hhmm(alt[1])}", callback_data="addtask_alt"
+                )])
+            keyboard.append([InlineKeyboardButton("❌ Cancel", callback_data="addtask_cancel")])
+
+            # Google returns the calendar's offset; show it like the task, in DEFAULT_TIMEZONE
+            clash_start = clash[0].astimezone(ZoneInfo(DEFAULT_TIMEZONE))
+            clash_end = clash[1].astimezone(ZoneInfo(DEFAULT_TIMEZONE))
+            lines = [
+                "⚠️ *Time conflict!*",
+                "─────────────────────",
+                f"📝 {parsed['title']}",
+                f"📅 {_slot_text(start_dt, end_dt)}",
+                f"overlaps 📌 {clash[2]} ({fmt_hhmm(clash_start)}–{fmt_hhmm(clash_end)})",
+            ]
+            if alt:
+                lines.append(f"💡 Next free slot: {_slot_text(*alt)}")
+            await send_text(
+                update.effective_chat,
+                "\n".join(lines),
+                parse_mode="Markdown",
+                reply_markup=InlineKeyboardMarkup(keyboard),
+            )
+            return
+
+        await _create_task(update, parsed["title"], start_dt, end_dt, event_id)
+    except Exception as e:
+        log.exception("Addtask failed: %s", e)
+        await send_text(update.effective_chat, "❌ Failed to add event.")
+
+
+async def _resolve_conflict(update: Update, context: ContextTypes.DEFAULT_TYPE, choice: str) -> None:
+    task = context.chat_data.pop("pending_task", None)
+    if not task:
+        await send_text(update.effective_chat, "ℹ️ Nothing to confirm. Use `/addtask` again.", parse_mode="Markdown")
+        return
+    if choice == "addtask_cancel":
+        await send_text(update.effective_chat, "❌ Task not added.")
+        return
+    start_dt, end_dt = task["alt"] if choice == "addtask_alt" and task["alt"] else (task["start"], task["end"])
+    try:
+        # reuse the original /addtask id, not the button press's update
+        await _create_task(update, task["title"], start_dt, end_dt, task["event_id"])
     except Exception as e:
         log.exception("Addtask failed: %s", e)
         await send_text(update.effective_chat, "❌ Failed to add event.")
 
 
+async def free(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    try:
+        minutes = int(context.args[0]) if context.args else 60
+        count = int(context.args[1]) if context.args and len(context.args) > 1 else 5
+        if minutes <= 0 or not 0 < count <= 20:
+            raise ValueError
+    except ValueError:
+        await send_text(update.effective_chat, "Usage: `/free [minutes] [count]`", parse_mode="Markdown")
+        return
+
+    tz = DEFAULT_TIMEZONE
+    now = datetime.now(ZoneInfo(tz))
+    until = now + calendar_index.HORIZON
+    try:
+        idx = calendar_index.get_index(update.effective_chat.id, now, until, tz)
+        slots = idx.free_slots(timedelta(minutes=minutes), now, until, count, tz)
+        if not slots:
+            await send_text(update.effective_chat, f"😬 No free {minutes}-minute slots in the next 7 days.")
+            return
+
+        lines = [f"🟢 *Next free {minutes}-minute slots*", "─────────────────────"]
+        lines += [f"📅 {_slot_text(s, e)}" for s, e in slots]
+        await send_text(update.effective_chat, "\n".join(lines), parse_mode="Markdown")
+    except Exception as e:
+        log.exception("Free slots failed: %s", e)
+        await send_text(update.effective_chat, "❌ Couldn’t fetch events. Check Google auth.")
+
+
 async def done(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     text = " ".join(context.args).strip()
     if not text:
         await send_text(update.effective_chat, "Usage: `/done <task title>`", parse_mode="Markdown")
         return
     try:
-        log_task_update(text, "done")
+        analytics.refresh(log_task_update(text, "done", update_id=update.update_id))
         await send_text(update.effective_chat, f"✅ Task marked as *done*: {text}", parse_mode="Markdown")
     except Exception as e:
         log.exception("Done failed: %s", e)
@@ -173,16 +280,45 @@ async def pending(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await send_text(update.effective_chat, "Usage: `/pending <task title>`", parse_mode="Markdown")
         return
     try:
-        log_task_update(text, "pending")
+        analytics.refresh(log_task_update(text, "pending", update_id=update.update_id))
         await send_text(update.effective_chat, f"⏳ Task marked as *pending*: {text}", parse_mode="Markdown")
     except Exception as e:
         log.exception("Pending failed: %s", e)
         await send_text(update.effective_chat, "❌ Could not mark as pending.")
 
 
+def _recent_events(days: int = 30) -> list[dict]:
+    """Calendar events of the last `days` days (empty if Calendar is unreachable)."""
+    end_dt = datetime.now(ZoneInfo(DEFAULT_TIMEZONE))
+    try:
+        return list_events_between(end_dt - timedelta(days=days), end_dt, DEFAULT_TIMEZONE)
+    except Exception as e:
+        log.warning("Could not fetch events for stats: %s", e)
+        return []
+
+
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    try:
+        analytics.refresh()
+        result = analytics.compute_stats(_recent_events(), DEFAULT_TIMEZONE)
+        if not result["tasks"]:
+            await send_text(update.effective_chat, "ℹ️ No data yet. Try adding and completing tasks first!")
+            return
+        await send_text(update.effective_chat, analytics.format_stats(result), parse_mode="Markdown")
+    except Exception as e:
+        log.exception("Stats failed: %s", e)
+        await send_text(update.effective_chat, "❌ Could not compute stats.")
+
+
 async def report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    options = {a.lower() for a in (context.args or [])}
     try:
-        xlsx_path, png_path = generate_report()
+        trends = None
+        if options & {"trends", "stats"}:
+            analytics.refresh()
+        if "trends" in options:
+            trends = analytics.rolling_trends()
+        xlsx_path, png_path = generate_report(trends)
 
         await send_text(update.effective_chat, "📊 *Your Progress Report!*", parse_mode="Markdown")
         # context managers to close files
@@ -190,6 +326,9 @@ async def report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             await send_document(update.effective_chat, document=f1)
         with open(png_path, "rb") as f2:
             await send_photo(update.effective_chat, photo=f2)
+        if "stats" in options:
+            result = analytics.compute_stats(_recent_events(), DEFAULT_TIMEZONE)
+            await send_text(update.effective_chat, analytics.format_stats(result), parse_mode="Markdown")
 
         # Also email it
         send_report_email(
@@ -218,6 +357,9 @@ async def clear(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         png_file = DATA_DIR / "progress.png"
         if png_file.exists():
             os.remove(png_file)
+        analytics.reset()
+        # don't let a crash restore the pre-clear aggregates from an older snapshot
+        state_store.save_snapshot()
 
         await send_text(
             update.effective_chat,
@@ -274,10 +416,14 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     if query.data == "today":
         await today(update, context)
+    elif query.data in ("addtask_force", "addtask_alt", "addtask_cancel"):
+        await _resolve_conflict(update, context, query.data)
     elif query.data == "add_task":
         await send_text(update.effective_chat, "💡 Use `/addtask <task description>` to add a task.")
     elif query.data == "report":
         await report(update, context)
+    elif query.data == "stats":
+        await stats(update, context)
     elif query.data == "clear":
         await clear(update, context)
     elif query.data == "done_info":
@@ -292,14 +438,24 @@ def build_app() -> Application:
     if not TELEGRAM_BOT_TOKEN:
         raise RuntimeError("TELEGRAM_BOT_TOKEN not set. Add it to your .env")
 
-    app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    app = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .persistence(state_store.persistence())
+        .post_init(state_store.post_init)
+        .post_shutdown(state_store.post_shutdown)
+        .build()
+    )
+    state_store.install(app)  # skip updates already handled before a restart
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_cmd))
     app.add_handler(CommandHandler("today", today))
     app.add_handler(CommandHandler("addtask", addtask))
+    app.add_handler(CommandHandler("free", free))
     app.add_handler(CommandHandler("done", done))
     app.add_handler(CommandHandler("pending", pending))
     app.add_handler(CommandHandler("report", report))
+    app.add_handler(CommandHandler("stats", stats))
     app.add_handler(CommandHandler("clear", clear))
     app.add_handler(MessageHandler(filters.VOICE, handle_voice))
     app.add_handler(CallbackQueryHandler(button_handler))  # Inline buttons
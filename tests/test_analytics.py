@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from datetime import date
+
+from productivity_bot import analytics, excel_report
+
+
+def test_incremental_refresh_matches_cold_refresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_report, "EXCEL_FILE", tmp_path / "progress.xlsx")
+    analytics._synthetic_log(years=1, per_day=3).to_excel(excel_report.EXCEL_FILE, index=False)
+
+    analytics.reset()
+    analytics.refresh()
+    analytics.refresh(excel_report.log_task_update("task 1", "done"))
+    incremental = analytics.compute_stats()
+
+    analytics.reset()
+    analytics.refresh()
+    assert analytics.compute_stats() == incremental
+    analytics.reset()
+
+
+def test_refresh_with_logged_frame_skips_reread(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_report, "EXCEL_FILE", tmp_path / "progress.xlsx")
+    analytics.reset()
+
+    analytics.refresh(excel_report.log_task_update("write tests", "pending"))
+    analytics.refresh(excel_report.log_task_update("write tests", "done"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("refresh() re-read the Excel log")
+
+    monkeypatch.setattr(analytics.pd, "read_excel", fail)
+    analytics.refresh()
+    stats = analytics.compute_stats()
+    assert stats["done"] == 1 and stats["pending"] == 1
+    assert stats["completion_rate"] == 1.0
+    analytics.reset()
+
+
+def test_streaks_before_first_logged_day():
+    analytics.reset()
+    analytics._AGG.ingest(analytics.pd.DataFrame({
+        "date": ["2026-10-01", "2026-10-02", "2026-10-04"],
+        "task": ["a", "b", "c"],
+        "status": ["done", "done", "done"],
+    }))
+
+    assert analytics.streaks(date(2026, 9, 1)) == (0, 2)
+    assert analytics.streaks(date(2026, 10, 4)) == (1, 2)
+    assert analytics.streaks(date(2026, 10, 3)) == (2, 2)
+    analytics.reset()
+
+
+def test_latency_same_for_batch_and_row_by_row_ingest():
+    log = analytics.pd.DataFrame({
+        "date": ["2026-10-01", "2026-10-01", "2026-10-03", "2026-10-03", "2026-10-05", "2026-10-09"],
+        "task": ["A", "b", "A", "b", "A", "A"],
+        "status": ["pending", "pending", "done", "done", "pending", "done"],
+    })
+
+    analytics.reset()
+    analytics._AGG.ingest(log)
+    batch = sorted(map(tuple, analytics._AGG.latency.values.tolist()))
+    batch_slowest = analytics.compute_stats(today=date(2026, 10, 9))["slowest"]
+
+    analytics.reset()
+    for i in range(1, len(log) + 1):
+        analytics._AGG.ingest(log.iloc[:i])
+    rows = sorted(map(tuple, analytics._AGG.latency.values.tolist()))
+
+    assert batch == rows == [("a", 2), ("a", 4), ("b", 2)]
+    assert batch_slowest == analytics.compute_stats(today=date(2026, 10, 9))["slowest"] == {"a": 4, "b": 2}
+    analytics.reset()
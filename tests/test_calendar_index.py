@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from productivity_bot import calendar_index
+from productivity_bot.calendar_index import HORIZON, IntervalIndex
+
+TZ = ZoneInfo("Asia/Kolkata")
+
+
+def _at(hour: int, minute: int = 0, day: int = 20) -> datetime:
+    return datetime(2026, 10, day, hour, minute, tzinfo=TZ)
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+
+    def fake_list_events_between(lo, hi, tz=None):
+        calls.append((lo, hi))
+        return []
+
+    monkeypatch.setattr(calendar_index, "list_events_between", fake_list_events_between)
+    monkeypatch.setattr(calendar_index, "_INDEXES", {})
+    return calls
+
+
+def test_conflict_finds_overlapping_interval():
+    idx = IntervalIndex(_at(0), _at(0, day=27))
+    idx.add(_at(10), _at(11), "a")
+    idx.add(_at(9), _at(13), "long")
+    idx.add(_at(14), _at(15), "b")
+
+    assert idx.conflict(_at(13), _at(14)) is None
+    assert idx.conflict(_at(12), _at(12, 30))[2] == "long"
+    assert idx.conflict(_at(14, 30), _at(16))[2] == "b"
+
+
+def test_free_slots_skip_busy_time_and_stay_in_range():
+    idx = IntervalIndex(_at(0), _at(0, day=21))
+    idx.add(_at(9), _at(13), "long")
+
+    slots = idx.free_slots(timedelta(hours=2), _at(8), _at(0, day=28), 10, "Asia/Kolkata")
+    assert slots[0] == (_at(13), _at(15))
+    assert all(end <= idx.hi for _, end in slots)
+    assert idx.next_free(_at(10), timedelta(hours=2), "Asia/Kolkata") == (_at(13), _at(15))
+
+
+def test_second_free_lookup_makes_no_fetch(fetches):
+    for _ in range(3):
+        now = datetime.now(TZ)
+        calendar_index.get_index(1, now, now + HORIZON)
+    assert len(fetches) == 1
+
+
+def test_addtask_lookups_for_tomorrow_reuse_index(fetches):
+    start = datetime.now(TZ) + timedelta(days=1)
+    for _ in range(3):
+        idx = calendar_index.get_index(1, start, start + timedelta(hours=1))
+        idx.next_free(start, timedelta(hours=1))
+    assert len(fetches) == 1
+
+
+def test_own_event_is_recognised_on_replay(fetches, monkeypatch):
+    start = datetime.now(TZ) + timedelta(days=1)
+    end = start + timedelta(hours=1)
+    monkeypatch.setattr(
+        calendar_index,
+        "list_events_between",
+        lambda lo, hi, tz=None: [{
+            "id": "pbot1u42",
+            "summary": "Gym",
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": end.isoformat()},
+        }],
+    )
+    idx = calendar_index.get_index(1, start, end)
+    assert idx.has_event("pbot1u42")
+    assert not idx.has_event("pbot1u43")
+
+    calendar_index.record(1, start, end, "Gym", "pbot1u42")
+    assert len(idx) == 1
+
+
+def test_restored_index_is_reused_within_ttl(fetches):
+    now = datetime.now(TZ)
+    calendar_index.get_index(1, now, now + HORIZON)
+    saved = calendar_index.snapshot()
+
+    calendar_index._INDEXES.clear()
+    calendar_index.restore(saved)
+    calendar_index.get_index(1, now, now + HORIZON)
+    assert len(fetches) == 1
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from productivity_bot import google_calendar
+
+TZ = ZoneInfo("Asia/Kolkata")
+START = datetime(2026, 10, 20, 10, 0, tzinfo=TZ)
+END = START + timedelta(hours=1)
+
+
+class _Request:
+    def __init__(self, fn):
+        self.execute = fn
+
+
+class _Events:
+    def __init__(self, existing: dict):
+        self.existing = existing
+
+    def insert(self, calendarId, body):
+        def conflict():
+            raise HttpError(SimpleNamespace(status=409, reason="Conflict"), b"duplicate")
+        return _Request(conflict)
+
+    def get(self, calendarId, eventId):
+        return _Request(lambda: self.existing)
+
+
+def _service(existing: dict):
+    events = _Events(existing)
+    return SimpleNamespace(events=lambda: events)
+
+
+def test_replayed_insert_returns_existing_event(monkeypatch):
+    existing = {"id": "pbot1u2t3", "summary": "Gym", "start": {"dateTime": START.isoformat()}}
+    monkeypatch.setattr(google_calendar, "get_service", lambda: _service(existing))
+
+    assert google_calendar.add_event("Gym", START, END, event_id="pbot1u2t3") is existing
+
+
+def test_id_taken_by_different_event_raises(monkeypatch):
+    existing = {"id": "pbot1u2t3", "summary": "Dentist", "start": {"dateTime": START.isoformat()}}
+    monkeypatch.setattr(google_calendar, "get_service", lambda: _service(existing))
+
+    with pytest.raises(HttpError):
+        google_calendar.add_event("Gym", START, END, event_id="pbot1u2t3")
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import time
+
+from productivity_bot.state_store import UpdateWindow
+
+
+def test_mark_seen_and_offset():
+    w = UpdateWindow(size=8)
+    assert not w.seen(100)
+    assert w.offset is None
+
+    for uid in (100, 101, 103):
+        w.mark(uid)
+    assert [w.seen(uid) for uid in range(100, 105)] == [True, True, False, True, False]
+    assert w.offset == 104
+
+
+def test_window_slides_forward():
+    w = UpdateWindow(size=8)
+    for uid in (100, 101, 103):
+        w.mark(uid)
+    w.mark(110)
+
+    assert w.base == 103
+    assert w.seen(101)  # slid out of the window after being processed
+    assert w.seen(103) and w.seen(110)
+    assert not w.seen(104) and not w.seen(111)
+    assert w.offset == 111
+
+
+def test_much_lower_id_resets_window():
+    w = UpdateWindow(size=8)
+    w.mark(5000)
+
+    assert not w.seen(42)
+    w.mark(42)
+    assert w.base == 42
+    assert w.seen(42) and not w.seen(43)
+    assert w.offset == 43
+
+
+def test_checkpoint_round_trip():
+    w = UpdateWindow()
+    for uid in (7, 8, 12):
+        w.mark(uid)
+    loaded = UpdateWindow.from_dict(w.to_dict())
+    assert loaded.base == w.base and loaded.bits == w.bits and loaded.offset == 13
+
+
+def test_week_old_checkpoint_is_discarded():
+    w = UpdateWindow()
+    w.mark(5000)
+    data = w.to_dict()
+
+    loaded = UpdateWindow.from_dict(data, now=time.time() + 8 * 24 * 3600)
+    assert loaded.offset is None
+    assert not loaded.seen(42)
+
+
+def test_idle_week_in_memory_resets_window():
+    w = UpdateWindow()
+    w.mark(1_000_000)
+    assert w.seen(998_000)  # just below the window: slid out after processing
+
+    w.last_mark -= 8 * 24 * 3600
+    assert not w.seen(998_000)
+    w.mark(998_000)
+    assert w.base == 998_000 and w.offset == 998_001
+
+
+def test_snapshot_after_clear_restores_empty_aggregates(tmp_path, monkeypatch):
+    import pandas as pd
+
+    from productivity_bot import analytics, state_store
+
+    monkeypatch.setattr(state_store, "SNAPSHOT_FILE", tmp_path / "snapshot.pickle")
+    analytics.reset()
+    analytics._AGG.ingest(pd.DataFrame({"date": ["2026-10-01"], "task": ["a"], "status": ["done"]}))
+    state_store.save_snapshot()
+
+    # what /clear does
+    analytics.reset()
+    state_store.save_snapshot()
+
+    analytics._AGG.rows = 99
+    assert state_store.load_snapshot()
+    assert analytics._AGG.rows == 0 and not analytics._AGG.tasks
+    analytics.reset()